@@ -0,0 +1,447 @@
+"""
+Load test for the Post Feed API.
+
+Seeds a local database, starts the app under gunicorn (WSGI) or uvicorn (ASGI), drives a realistic
+mix of register / token / feed / like / unlike / post-list traffic from many simulated users and
+prints a throughput, latency-percentile and error-rate report. Exits with status 1 if any SLO is missed.
+
+    cd postfeed
+    python loadtest/run.py --users 50 --duration 60 --seed-posts 2000 --slo-p95-ms 300
+
+Runs against a throwaway sqlite file unless --database-url names a database to use instead (Postgres is
+closest to production). That database is flushed and reseeded, so never point it at one you care about;
+DATABASE_URL from the environment is deliberately ignored.
+Pass --base-url to point the traffic at a server that is already running instead.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+#relative weight of each action a simulated user picks after logging in
+TRAFFIC_MIX = {
+    "feed": 35,
+    "post_list": 25,
+    "like": 18,
+    "unlike": 12,
+    "token": 6,
+    "register": 4,
+}
+
+SERVERS = {
+    "gunicorn": lambda host, port, workers: [
+        sys.executable, "-m", "gunicorn", "postfeed.wsgi:application",
+        "--bind", f"{host}:{port}", "--workers", str(workers), "--log-level", "warning",
+    ],
+    "uvicorn": lambda host, port, workers: [
+        sys.executable, "-m", "uvicorn", "postfeed.asgi:application",
+        "--host", host, "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+    ],
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the Post Feed API and check it against SLOs")
+    parser.add_argument("--server", choices=sorted(SERVERS), default="gunicorn", help="App server to start")
+    parser.add_argument("--workers", type=int, default=2, help="Number of server worker processes")
+    parser.add_argument("--port", type=int, default=0, help="Port to serve on (default: a free one)")
+    parser.add_argument("--base-url", help="Test an already running server instead of starting one")
+
+    parser.add_argument("--database-url", help="Database to flush, seed and serve from (default: a throwaway sqlite file)")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the database as it is")
+    parser.add_argument("--seed-users", type=int, default=50, help="Number of seeded users")
+    parser.add_argument("--seed-tags", type=int, default=30, help="Number of seeded tags")
+    parser.add_argument("--seed-posts", type=int, default=500, help="Number of seeded posts")
+    parser.add_argument("--seed-likes", type=int, default=1000, help="Number of seeded likes")
+
+    parser.add_argument("--users", type=int, default=20, help="Number of concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of traffic to generate")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds over which users are started")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Max random pause between requests (s)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout (s)")
+
+    parser.add_argument("--slo-p50-ms", type=float, help="Max overall p50 latency")
+    parser.add_argument("--slo-p95-ms", type=float, default=500.0, help="Max overall p95 latency")
+    parser.add_argument("--slo-p99-ms", type=float, default=1000.0, help="Max overall p99 latency")
+    parser.add_argument("--slo-error-rate", type=float, default=0.01, help="Max fraction of failed requests")
+    parser.add_argument("--slo-min-rps", type=float, default=0.0, help="Min overall requests per second")
+    parser.add_argument("--json", dest="json_path", help="Also write the report as JSON to this path")
+    return parser.parse_args(argv)
+
+
+# --- stand-in stack -------------------------------------------------------
+
+def manage(env, *args):
+    subprocess.run([sys.executable, "manage.py", *args], cwd=PROJECT_DIR, env=env, check=True)
+
+
+def prepare_database(args, env):
+    manage(env, "migrate", "--verbosity=0")
+    if not args.skip_seed:
+        print(f"Seeding {args.seed_users} users, {args.seed_tags} tags, {args.seed_posts} posts, {args.seed_likes} likes...")
+        manage(
+            env, "seed", "--flush",
+            f"--users={args.seed_users}", f"--tags={args.seed_tags}",
+            f"--posts={args.seed_posts}", f"--likes={args.seed_likes}",
+        )
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, env, host, port):
+    cmd = SERVERS[args.server](host, port, args.workers)
+    server = subprocess.Popen(cmd, cwd=PROJECT_DIR, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"{args.server} exited with status {server.returncode}")
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit(f"{args.server} did not start listening on {host}:{port}")
+
+
+# --- HTTP client ----------------------------------------------------------
+
+class HttpClient:
+    """
+    Minimal asyncio HTTP/1.1 client with keep-alive, so the harness needs nothing beyond the stdlib.
+    """
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method, path, payload=None, token=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        lines = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Accept: application/json",
+            f"Content-Length: {len(body)}",
+        ]
+        if payload is not None:
+            lines.append("Content-Type: application/json")
+        if token:
+            lines.append(f"Authorization: Bearer {token}")
+        raw = ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+        reused = self.writer is not None
+        try:
+            return await asyncio.wait_for(self._send(raw), self.timeout)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await self.close()
+            if not reused:
+                raise
+            #the server dropped an idle keep-alive connection; retry once on a fresh one
+            return await asyncio.wait_for(self._send(raw), self.timeout)
+        except BaseException:
+            await self.close()
+            raise
+
+    async def _send(self, raw):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(raw)
+        await self.writer.drain()
+
+        status_line = await self.reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                body += chunk[:-2]
+        elif "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await self.reader.read()
+            headers["connection"] = "close"
+
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, body
+
+
+# --- simulated users ------------------------------------------------------
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)     # endpoint -> [ms]
+        self.errors = defaultdict(int)         # endpoint -> failed requests
+        self.statuses = defaultdict(int)       # "endpoint status" -> count
+
+    def record(self, endpoint, started, status):
+        self.latencies[endpoint].append((time.perf_counter() - started) * 1000.0)
+        self.statuses[f"{endpoint} {status}"] += 1
+        if status >= 400 or status == 0:
+            self.errors[endpoint] += 1
+
+
+class VirtualUser:
+    def __init__(self, vu_id, client, stats, args, run_id):
+        self.vu_id = vu_id
+        self.client = client
+        self.stats = stats
+        self.args = args
+        self.run_id = run_id
+        self.sessions = 0
+        self.token = None
+        self.username = None
+        self.post_ids = []
+        self.liked = set()
+
+    async def call(self, endpoint, method, path, payload=None, auth=True):
+        started = time.perf_counter()
+        try:
+            status, body = await self.client.request(method, path, payload, self.token if auth else None)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            self.stats.record(endpoint, started, 0)
+            return 0, None
+        self.stats.record(endpoint, started, status)
+        try:
+            return status, json.loads(body) if body else None
+        except ValueError:
+            return status, None
+
+    async def register(self):
+        self.sessions += 1
+        self.username = f"lt{self.run_id}_{self.vu_id}_{self.sessions}"
+        payload = {"username": self.username, "password": "loadtest-pass", "email": f"{self.username}@example.com"}
+        await self.call("register", "POST", "/api/users/", payload, auth=False)
+        await self.login()
+
+    async def login(self):
+        payload = {"username": self.username, "password": "loadtest-pass"}
+        status, data = await self.call("token", "POST", "/api/token/", payload, auth=False)
+        if status == 200 and data:
+            self.token = data["access"]
+
+    async def post_list(self):
+        status, data = await self.call("post_list", "GET", "/api/posts/")
+        if status == 200 and data is not None:
+            rows = data["results"] if isinstance(data, dict) else data
+            ids = [row["id"] for row in rows if "id" in row]
+            if ids:
+                self.post_ids = ids
+
+    async def feed(self):
+        status, data = await self.call("feed", "GET", "/api/feed/?limit=20")
+        if status == 200 and data and not self.post_ids:
+            self.post_ids = [row["id"] for row in data["results"]]
+
+    async def like(self):
+        if not self.post_ids:
+            return await self.post_list()
+        post_id = random.choice(self.post_ids)
+        await self.call("like", "POST", f"/api/posts/{post_id}/like/")
+        self.liked.add(post_id)
+
+    async def unlike(self):
+        if not self.liked:
+            return await self.like()
+        post_id = self.liked.pop()
+        await self.call("unlike", "DELETE", f"/api/posts/{post_id}/unlike/")
+
+    async def token_refresh(self):
+        await self.login()
+
+    async def run(self, deadline):
+        actions = {
+            "feed": self.feed,
+            "post_list": self.post_list,
+            "like": self.like,
+            "unlike": self.unlike,
+            "token": self.token_refresh,
+            "register": self.register,
+        }
+        names, weights = zip(*TRAFFIC_MIX.items())
+        await self.register()
+        while time.monotonic() < deadline:
+            await actions[random.choices(names, weights)[0]]()
+            if self.args.think_time:
+                await asyncio.sleep(random.uniform(0, self.args.think_time))
+        await self.client.close()
+
+
+async def drive(args, host, port):
+    stats = Stats()
+    run_id = uuid.uuid4().hex[:6]
+    started = time.monotonic()
+    deadline = started + args.ramp_up + args.duration
+
+    async def start(vu_id):
+        await asyncio.sleep(args.ramp_up * vu_id / max(args.users, 1))
+        vu = VirtualUser(vu_id, HttpClient(host, port, args.timeout), stats, args, run_id)
+        await vu.run(deadline)
+
+    await asyncio.gather(*(start(i) for i in range(args.users)))
+    return stats, time.monotonic() - started
+
+
+# --- report ---------------------------------------------------------------
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": errors / count if count else 0.0,
+        "rps": count / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+    }
+
+
+def build_report(stats, elapsed):
+    endpoints = {
+        name: summarize(values, stats.errors[name], elapsed)
+        for name, values in sorted(stats.latencies.items())
+    }
+    every = [ms for values in stats.latencies.values() for ms in values]
+    return {
+        "elapsed_s": elapsed,
+        "overall": summarize(every, sum(stats.errors.values()), elapsed),
+        "endpoints": endpoints,
+        "statuses": dict(sorted(stats.statuses.items())),
+    }
+
+
+def check_slos(report, args):
+    """Returns a list of human readable SLO violations (empty when the run passed)."""
+    overall = report["overall"]
+    checks = [
+        ("p50_ms", args.slo_p50_ms, "max"),
+        ("p95_ms", args.slo_p95_ms, "max"),
+        ("p99_ms", args.slo_p99_ms, "max"),
+        ("error_rate", args.slo_error_rate, "max"),
+        ("rps", args.slo_min_rps, "min"),
+    ]
+    failures = []
+    if not overall["requests"]:
+        failures.append("no requests completed")
+    for key, limit, kind in checks:
+        if limit is None:
+            continue
+        value = overall[key]
+        if (kind == "max" and value > limit) or (kind == "min" and value < limit):
+            failures.append(f"{key} = {value:.3f} ({'above' if kind == 'max' else 'below'} {limit})")
+    return failures
+
+
+def print_report(report, failures):
+    header = f"{'endpoint':<12}{'reqs':>8}{'rps':>9}{'err%':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print()
+    print(header)
+    print("-" * len(header))
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["overall"])]
+    for name, s in rows:
+        print(
+            f"{name:<12}{s['requests']:>8}{s['rps']:>9.1f}{s['error_rate'] * 100:>7.2f}%"
+            f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}"
+        )
+    print(f"\nlatencies in ms over {report['elapsed_s']:.1f}s")
+    print("statuses: " + ", ".join(f"{k}: {v}" for k, v in report["statuses"].items()))
+    if failures:
+        print("\nSLO FAILED:")
+        for failure in failures:
+            print(f"  - {failure}")
+    else:
+        print("\nSLO passed")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = None
+    tmpdir = None
+
+    if args.base_url:
+        url = urlsplit(args.base_url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = "127.0.0.1", args.port or free_port()
+        env = dict(os.environ)
+        #never fall back to the inherited DATABASE_URL: seeding flushes whatever database it is given
+        if args.database_url:
+            env["DATABASE_URL"] = args.database_url
+        else:
+            if env.get("DATABASE_URL"):
+                print("Ignoring DATABASE_URL from the environment, pass --database-url to load test that database")
+            tmpdir = tempfile.TemporaryDirectory(prefix="postfeed-loadtest-")
+            env["DATABASE_URL"] = f"sqlite:///{tmpdir.name}/loadtest.db"
+        env.setdefault("SECRET_KEY", "loadtest-secret-key-not-for-production")
+        env["ALLOWED_HOSTS"] = f"{host},localhost"
+        prepare_database(args, env)
+        server = start_server(args, env, host, port)
+
+    try:
+        print(f"Running {args.users} users for {args.duration:.0f}s against {host}:{port}...")
+        stats, elapsed = asyncio.run(drive(args, host, port))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    report = build_report(stats, elapsed)
+    failures = check_slos(report, args)
+    report["slo_failures"] = failures
+    print_report(report, failures)
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
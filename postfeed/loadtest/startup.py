@@ -0,0 +1,125 @@
+"""
+Startup-time benchmark for the Post Feed API.
+
+Boots the WSGI application in fresh processes and measures how long the import takes and how long the
+first and second requests to the schema, feed and tag autocomplete endpoints take, in two modes:
+
+    cold       - schema generated on request, no warm-up (the previous behaviour)
+    optimized  - prebuilt OpenAPI schema file and the startup warm-up hook
+
+    cd postfeed
+    python loadtest/startup.py --runs 5
+
+Seeds a throwaway sqlite file unless --database-url names a scratch database to flush and seed instead,
+and sends the feed and autocomplete requests with a real JWT so they query the database and tag index.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+#runs inside each fresh process; only stdlib imports happen before the clock starts
+CHILD = r"""
+import json, os, sys, time
+from wsgiref.util import setup_testing_defaults
+
+def call(application, path, query=""):
+    environ = {
+        "PATH_INFO": path, "QUERY_STRING": query, "REQUEST_METHOD": "GET", "HTTP_HOST": "localhost",
+        "HTTP_AUTHORIZATION": "Bearer " + os.environ["STARTUP_BENCH_TOKEN"],
+    }
+    setup_testing_defaults(environ)
+    statuses = []
+    started = time.perf_counter()
+    response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b"".join(response)
+    response.close()
+    elapsed = (time.perf_counter() - started) * 1000
+    if not statuses[0].startswith("200"):
+        sys.exit(f"{path} answered {statuses[0]}, not timing an error response")
+    return elapsed
+
+started = time.perf_counter()
+from postfeed.wsgi import application
+timings = {"boot": (time.perf_counter() - started) * 1000}
+for path, query in (("/api/schema/", ""), ("/api/feed/", ""), ("/api/tags/autocomplete/", "q=a")):
+    timings[f"first {path}"] = call(application, path, query)
+    timings[f"second {path}"] = call(application, path, query)
+timings["modules"] = len(sys.modules)
+print(json.dumps(timings))
+"""
+
+
+#printed by `manage.py shell` during setup, so the timed processes only pay for the request itself
+MINT_TOKEN = """
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.tokens import AccessToken
+user = get_user_model().objects.order_by("id").first()
+print(AccessToken.for_user(user))
+"""
+
+
+def manage(env, *args):
+    return subprocess.run(
+        [sys.executable, "manage.py", *args], cwd=PROJECT_DIR, env=env, check=True, capture_output=True, text=True
+    ).stdout
+
+
+def run_once(env):
+    #a fresh token per run: access tokens expire after a few minutes
+    env = {**env, "STARTUP_BENCH_TOKEN": manage(env, "shell", "-c", MINT_TOKEN).strip().splitlines()[-1]}
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=PROJECT_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode:
+        raise SystemExit(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure worker boot and first-request times")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per mode")
+    parser.add_argument("--database-url", help="Scratch database to flush and seed (default: a throwaway sqlite file)")
+    parser.add_argument("--seed-posts", type=int, default=500, help="Number of seeded posts")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="postfeed-startup-") as tmp:
+        env = dict(os.environ)
+        #like run.py, never seed the inherited DATABASE_URL
+        env["DATABASE_URL"] = args.database_url or f"sqlite:///{tmp}/startup.db"
+        env.setdefault("SECRET_KEY", "startup-benchmark-key-not-for-production")
+        env["ALLOWED_HOSTS"] = "localhost"
+        schema_file = f"{tmp}/openapi-schema.json"
+
+        manage(env, "migrate", "--verbosity=0")
+        manage(env, "seed", "--flush", "--users=20", "--tags=30", f"--posts={args.seed_posts}", "--likes=500")
+        manage(env, "spectacular", "--format", "openapi-json", "--file", schema_file)
+
+        modes = {
+            "cold": {"STARTUP_WARMUP": "False", "SERVE_STATIC_SCHEMA": "False"},
+            "optimized": {"STARTUP_WARMUP": "True", "SERVE_STATIC_SCHEMA": "True", "OPENAPI_SCHEMA_FILE": schema_file},
+        }
+        results = {}
+        for mode, overrides in modes.items():
+            runs = [run_once({**env, **overrides}) for _ in range(args.runs)]
+            results[mode] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+    keys = list(results["cold"])
+    print(f"\nmedian of {args.runs} fresh processes (ms, modules = sys.modules count)\n")
+    print(f"{'':<32}" + "".join(f"{mode:>12}" for mode in results))
+    for key in keys:
+        print(f"{key:<32}" + "".join(f"{results[mode][key]:>12.1f}" for mode in results))
+    cold, fast = results["cold"], results["optimized"]
+    ready = lambda r: r["boot"] + r["first /api/schema/"] + r["first /api/feed/"] + r["first /api/tags/autocomplete/"]
+    print(f"\nboot + first requests: {ready(cold):.0f}ms cold, {ready(fast):.0f}ms optimized")
+
+
+if __name__ == "__main__":
+    main()
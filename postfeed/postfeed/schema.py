@@ -0,0 +1,67 @@
+"""
+OpenAPI schema and docs views that keep drf_spectacular out of the serving import graph.
+
+With SERVE_STATIC_SCHEMA=True the schema generated at build time with
+
+    python manage.py spectacular --format openapi-json --file openapi-schema.json
+
+is served from memory. Otherwise (local development) it is generated on request like before.
+Either way drf_spectacular's views are only imported when one of these URLs is first hit.
+"""
+
+import hashlib
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+
+_static_schema = None   # (body, etag) once the schema file has been read
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """Wraps a class-based view that is only imported and built on its first request."""
+    view = None
+
+    @csrf_exempt
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+_dynamic_schema = lazy_view("drf_spectacular.views.SpectacularAPIView")
+
+
+def load_static_schema():
+    """Reads the prebuilt schema file once; returns (body, etag) or None when it is not built."""
+    global _static_schema
+    if _static_schema is None:
+        path = Path(settings.OPENAPI_SCHEMA_FILE)
+        if not path.is_file():
+            return None
+        body = path.read_bytes()
+        _static_schema = (body, '"%s"' % hashlib.sha256(body).hexdigest()[:32])
+    return _static_schema
+
+
+def openapi_schema(request, *args, **kwargs):
+    if not settings.SERVE_STATIC_SCHEMA:
+        return _dynamic_schema(request, *args, **kwargs)
+
+    static = load_static_schema()
+    if static is None:
+        raise Http404("OpenAPI schema file has not been built")
+
+    body, etag = static
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="application/vnd.oai.openapi+json")
+    response["ETag"] = etag
+    response["Cache-Control"] = "public, max-age=3600"
+    return response
@@ -32,7 +32,7 @@ DEBUG = os.getenv("DEBUG", "False") == "True"
 
 ALLOWED_HOSTS = ["*"]
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [h for h in os.getenv("ALLOWED_HOSTS", "").split(",") if h]
 
 
 # Application definition
@@ -50,12 +50,24 @@ INSTALLED_APPS = [
 ]
 
 
+# OpenAPI schema generated at build time with
+#   python manage.py spectacular --format openapi-json --file openapi-schema.json
+# With SERVE_STATIC_SCHEMA=True workers serve that file and never import drf_spectacular's schema generator
+OPENAPI_SCHEMA_FILE = os.getenv("OPENAPI_SCHEMA_FILE", str(BASE_DIR / "openapi-schema.json"))
+SERVE_STATIC_SCHEMA = os.getenv("SERVE_STATIC_SCHEMA", "False") == "True"
+
+# Preload indexes and caches in each worker before it takes traffic (see posts/warmup.py)
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "True") == "True"
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
-    "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
+if not SERVE_STATIC_SCHEMA:
+    # the router touches every view's schema while loading urls, which would import the generator
+    REST_FRAMEWORK["DEFAULT_SCHEMA_CLASS"] = "drf_spectacular.openapi.AutoSchema"
+
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -102,6 +114,28 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Must be shared by every worker: the per-user seen-sets (posts/seen.py) live here, and a per-process
+# cache would let one worker keep serving posts another worker already recorded as seen.
+# Uses Redis when REDIS_URL is set, otherwise a database table (created by migration posts/0005_create_cache_table).
+
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "postfeed_cache",
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -1,12 +1,7 @@
 from django.core.management.base import BaseCommand
-from posts.factories import UserFactory, TagFactory, PostFactory, LikeFactory
+from posts.factories import fake, UserFactory, TagFactory, PostFactory, LikeFactory
 from django.core.management import call_command
 import random
-import factory
-from faker import Faker
-
-fake = Faker()
-fake.unique.clear()
 
 
 class Command(BaseCommand):
@@ -37,19 +32,23 @@ class Command(BaseCommand):
         
         users = UserFactory.create_batch(options["users"])
         tags = TagFactory.create_batch(options["tags"])
-        posts = PostFactory.create_batch(options["posts"])
-        likes = LikeFactory.create_batch(options["likes"])
-
-        # Assign random tags to posts (extra non-trivial bit)
-        for post in posts:
-            random_tags = random.sample(tags, random.randint(1, 3))
-            post.tags.add(*random_tags)
 
-        # Create likes with random users + posts
-        for _ in range(options["likes"]):
+        # Posts draw their authors and 1-3 tags from the pools above. Left to the factories, every post
+        # would create its own author and tags, and Faker runs out of unique tag words at a few hundred posts
+        posts = [
+            PostFactory(
+                author=random.choice(users),
+                tags=random.sample(tags, random.randint(1, min(3, len(tags)))) if tags else None,
+            )
+            for _ in range(options["posts"])
+        ]
+
+        # Create likes with random users + posts, at most one per (user, post) pair
+        likes = min(options["likes"], len(users) * len(posts))
+        for _ in range(likes):
             LikeFactory(user=random.choice(users), post=random.choice(posts))
 
         self.stdout.write(self.style.SUCCESS(
             f"Seeded: {options['users']} users, {options['tags']} tags, "
-            f"{options['posts']} posts, {options['likes']} likes"
+            f"{options['posts']} posts, {likes} likes"
         ))
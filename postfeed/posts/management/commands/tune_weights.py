@@ -0,0 +1,104 @@
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.recommendation import DEFAULT_WEIGHTS, Weights
+
+
+def float_list(value):
+    return [float(v) for v in value.split(",") if v.strip()]
+
+
+class Command(BaseCommand):
+    help = "Replay historical feeds from Like timestamps and rank candidate scoring weights offline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--search", choices=["grid", "random"], default="grid", help="Search strategy")
+        parser.add_argument("--trials", type=int, default=100, help="Number of settings to try with --search=random")
+        parser.add_argument("--recency", type=float_list, default=[1.0, 2.0, 3.0, 4.0], help="Recency weights (grid values or random min,max)")
+        parser.add_argument("--popularity", type=float_list, default=[0.4, 0.8, 1.2], help="Popularity weights")
+        parser.add_argument("--affinity", type=float_list, default=[0.6, 1.2, 2.4], help="Affinity weights")
+        parser.add_argument("--lambdas", type=float_list, default=[0.01, 0.05, 0.1], help="Recency decay lambdas")
+
+        parser.add_argument("--events", type=int, default=1000, help="Number of likes to replay as feed requests")
+        parser.add_argument("--negatives", type=int, default=500, help="Posts sampled per event to rank against (0 = all)")
+        parser.add_argument("--k", type=int, action="append", help="Cutoff(s) for hit-rate and NDCG (default 10)")
+        parser.add_argument("--metric", help="Metric to sort by (default ndcg@<first k>)")
+        parser.add_argument("--top", type=int, default=10, help="Number of settings to print")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for sampling")
+
+    def candidate_settings(self, options):
+        if options["search"] == "grid":
+            return [
+                Weights(*values)
+                for values in itertools.product(
+                    options["recency"], options["popularity"], options["affinity"], options["lambdas"]
+                )
+            ]
+        rng = random.Random(options["seed"])
+        span = lambda values: (min(values), max(values))
+        ranges = [span(options[name]) for name in ("recency", "popularity", "affinity", "lambdas")]
+        return [Weights(*(rng.uniform(lo, hi) for lo, hi in ranges)) for _ in range(options["trials"])]
+
+    def handle(self, *args, **options):
+        try:
+            from posts.replay import build_replay_dataset, evaluate_configs, init_worker
+        except ImportError as exc:
+            raise CommandError(f"tune_weights needs numpy installed ({exc})")
+
+        ks = options["k"] or [10]
+        metric = options["metric"] or f"ndcg@{ks[0]}"
+
+        started = time.monotonic()
+        dataset = build_replay_dataset(options["events"], options["negatives"], options["seed"])
+        if not dataset.num_events:
+            raise CommandError("No likes to replay, seed some data first")
+        self.stdout.write(
+            f"Replaying {dataset.num_events} feeds ({len(dataset.event_of)} candidate rows) "
+            f"built in {time.monotonic() - started:.1f}s"
+        )
+
+        # the production weights always go first so the report has a baseline
+        settings = [DEFAULT_WEIGHTS] + [w for w in self.candidate_settings(options) if w != DEFAULT_WEIGHTS]
+        plain = [tuple(w) for w in settings]
+        workers = max(1, min(options["workers"], len(plain)))
+        chunks = [plain[i::workers] for i in range(workers)]
+
+        started = time.monotonic()
+        if workers == 1:
+            results = evaluate_configs(plain, ks, dataset)
+        else:
+            with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(dataset,)) as pool:
+                results = [row for chunk in pool.map(evaluate_configs, chunks, [ks] * workers) for row in chunk]
+
+        if metric not in results[0][1]:
+            raise CommandError(f"Unknown metric {metric}, choose from {', '.join(results[0][1])}")
+        baseline = next(metrics for weights, metrics in results if weights == tuple(DEFAULT_WEIGHTS))
+        results.sort(key=lambda row: row[1][metric], reverse=True)
+        self.stdout.write(f"Scored {len(results)} settings on {workers} worker(s) in {time.monotonic() - started:.1f}s\n")
+
+        names = list(results[0][1])
+        header = f"{'recency':>8}{'popular':>8}{'affinity':>9}{'lambda':>8}  " + "".join(f"{n:>9}" for n in names)
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for weights, metrics in results[: options["top"]]:
+            self.stdout.write(self.format_row(weights, metrics, names))
+        self.stdout.write(self.style.WARNING(self.format_row(tuple(DEFAULT_WEIGHTS), baseline, names) + "  <- current"))
+
+        best = Weights(*results[0][0])
+        self.stdout.write(self.style.SUCCESS(
+            f"\nBest {metric} = {results[0][1][metric]:.4f} (current {baseline[metric]:.4f}). To use it set:\n"
+            f"WEIGHT_RECENCY={best.recency:.4g} WEIGHT_POPULARITY={best.popularity:.4g} "
+            f"WEIGHT_AFFINITY={best.affinity:.4g} RECENCY_LAMBDA={best.lam:.4g}"
+        ))
+
+    def format_row(self, weights, metrics, names):
+        recency, popularity, affinity, lam = weights
+        return f"{recency:>8.3g}{popularity:>8.3g}{affinity:>9.3g}{lam:>8.3g}  " + "".join(
+            f"{metrics[n]:>9.4f}" for n in names
+        )
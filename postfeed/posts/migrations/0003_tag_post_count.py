@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:55
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_post_count(apps, schema_editor):
+    Tag = apps.get_model("posts", "Tag")
+    for tag in Tag.objects.annotate(n=Count("posts")).only("id"):
+        Tag.objects.filter(id=tag.id).update(post_count=tag.n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_impression'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='post_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(backfill_post_count, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.contrib.auth import get_user_model
 
@@ -6,16 +8,29 @@ User = get_user_model()  #stores the results of the active User model-get_user_m
 
 class Tag(models.Model):    #define a database table for tags so posts can be categorized easily.
     name = models.CharField(max_length=64, unique=True) #each tag of 64 xters and unique=true ensure there are no duplicate tag names
+    post_count = models.PositiveIntegerField(default=0, db_index=True) #how many posts use this tag, kept up to date by posts/signals.py instead of Count("posts")
 
     def __str__(self):      #this fxn returns the tag name in strings and readable rep
         return self.name
 
+    def save(self, *args, **kwargs):
+        #post_count is only changed by F() updates in posts/signals.py; a full save of an instance loaded
+        #before its posts changed would write back a stale count, so existing rows never save it
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name != "post_count"
+            ]
+        super().save(*args, **kwargs)
+
 class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")    #links each post to a user, if user is deleted, their post is deleted too. with this you can acces a user with user.posts.all()
     text = models.TextField()               #stores posts content
     tags = models.ManyToManyField(Tag, related_name="posts", blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["-created_at", "-id"])]     #backs the cursor pagination of the post list
+
     def __str__(self):
         return f"Post({self.id}) by {self.author_id}"
 
@@ -27,4 +42,15 @@ class Like(models.Model):
     class Meta:
         unique_together = ("user", "post")      #ensures the user, port is unique
 
+def like_count_subquery():
+    #correlated count for annotate(), so only the rows actually fetched get their likes counted
+    likes = Like.objects.filter(post=OuterRef("pk")).values("post").annotate(c=Count("id")).values("c")
+    return Coalesce(Subquery(likes, output_field=IntegerField()), 0)
 
+class Impression(models.Model):     #records that a post was shown to a user in their feed, so we can stop serving it again on refresh
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="impressions")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="impressions")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "created_at"])]     #the seen-set is rebuilt from a user's recent impressions
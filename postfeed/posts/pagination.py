@@ -0,0 +1,19 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PostCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (created_at, id): each page is an indexed range scan, so its cost
+    does not grow with the size of the table the way OFFSET does.
+    """
+    ordering = ("-created_at", "-id")
+    page_size = 20
+    page_size_query_param = "limit"
+    max_page_size = 100
+
+
+class UserCursorPagination(CursorPagination):
+    ordering = ("id",)
+    page_size = 20
+    page_size_query_param = "limit"
+    max_page_size = 100
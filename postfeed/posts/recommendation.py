@@ -1,15 +1,20 @@
+import heapq
 import math
-from collections import Counter, defaultdict
+from collections import Counter, namedtuple
 from django.utils import timezone
-from django.db.models import Count
-from .models import Tag, Post, Like
+from .models import Tag, Post, Like, like_count_subquery
 import os
 
-#loads scoring weights for recommendation from the .env with defaults so they can be tuned or twerked without changing code
-W_R = float(os.getenv("WEIGHT_RECENCY", 0.5))
-W_P = float(os.getenv("WEIGHT_POPULARITY", 0.2))
-W_A = float(os.getenv("WEIGHT_AFFINITY", 0.3))
+#loads scoring weights for recommendation from the .env with defaults so they can be tuned or twerked without changing code.
+#pick new values offline with `python manage.py tune_weights`
+W_R = float(os.getenv("WEIGHT_RECENCY", 3.0))       # strong preference for fresh posts
+W_P = float(os.getenv("WEIGHT_POPULARITY", 0.8))    # popularity still matters but less
+W_A = float(os.getenv("WEIGHT_AFFINITY", 1.2))      # affinity gets the highest weight
 LAMBDA = float(os.getenv("RECENCY_LAMBDA", 0.05))
+SEEN_WEIGHT = float(os.getenv("SEEN_WEIGHT", 0.0)) #multiplier for posts the user has already seen; 0 drops them from the feed
+
+Weights = namedtuple("Weights", ["recency", "popularity", "affinity", "lam"])
+DEFAULT_WEIGHTS = Weights(W_R, W_P, W_A, LAMBDA)
 
 def recency_decay(created_at, now, lam=LAMBDA): #this computes how fresh a post is. new post will give high score, older post- decayed score
     age_hours = (now - created_at).total_seconds() / 3600.0 # this creates a time diff that is multiplied by its seconds equivalent first and then / by 3600 to conver back to hours.
@@ -19,9 +24,9 @@ def popularity(like_count):     #calculates popularity score using natural log o
     return math.log1p(like_count)
 
 #function calculates the weight of all liked tags by the user
-def build_user_tag_weights(user):#useful for building a recommendation engine to suggest posts to a user based on their interests.
-    # Count tags on posts the user liked
-    qs = Tag.objects.filter(posts__likes__user=user).values_list("name", flat=True) #filters post, that are liked by the user
+def build_user_tag_weights(user, key="name"):#useful for building a recommendation engine to suggest posts to a user based on their interests.
+    # Count tags on posts the user liked (keyed by tag name, or by id when key="id")
+    qs = Tag.objects.filter(posts__likes__user=user).values_list(key, flat=True) #filters post, that are liked by the user
     counts = Counter(qs)
     total = sum(counts.values()) or 1 #in the case of zero likes, expression evaluates to 1
     
@@ -34,9 +39,26 @@ def affinity(user_tag_weights, post_tags): #checks for posts user has more affin
     #note that len(post_tags) is to divide the sum of weights so that longer post with many tags do have a higher score because they have more tags.Its called normalization
     return sum(user_tag_weights.get(t.name, 0.0) for t in post_tags) / len(post_tags) 
 
-def score_posts_for_user(user, queryset):
+def combine_score(rec, pop, aff, like_count, post_id, weights, is_seen=False):
+    s = (
+        weights.recency * rec
+        + weights.popularity * pop
+        + weights.affinity * aff
+    )
+
+    #Add a very small tiebreaker from popularity (epsilon)
+    s += 0.0001 * like_count
+    s += (0.000001 * post_id)
+
+    if is_seen:
+        s *= SEEN_WEIGHT
+    return round(float(s), 6)
+
+def score_posts_for_user(user, queryset, seen=None, weights=DEFAULT_WEIGHTS):
     """
     queryset: Post queryset already annotated with like_count and prefetched tags.
+    seen: optional container of post ids the user has already seen (e.g. a SeenSet).
+    weights: a Weights tuple, defaults to the values loaded from the .env.
     Returns list of (post, score) sorted desc by score (then created_at, id).
     """
     now = timezone.now()
@@ -44,24 +66,18 @@ def score_posts_for_user(user, queryset):
 
     scored = []
     for p in queryset:
-        rec = recency_decay(p.created_at, now, LAMBDA)
+        is_seen = seen is not None and p.id in seen
+        if is_seen and SEEN_WEIGHT <= 0:
+            continue    #skip seen posts before doing any scoring work on them
+
+        rec = recency_decay(p.created_at, now, weights.lam)
 
         pop = popularity(getattr(p, "like_count", 0))
 
         aff = affinity(utw, list(p.tags.all()))
 
-        
-        s = (
-            3.0 * rec   # strong preference for fresh posts
-            + 0.8 * pop # popularity still matters but less
-            + 1.2 * aff # affinity gets the highest weight
-        )
-        
-        #Add a very small tiebreaker from popularity (epsilon)
-        s += 0.0001 * getattr(p, "like_count", 0)
-        s += (0.000001 * p.id)
-        
-        scored.append((p, round(float(s), 6)))
+        s = combine_score(rec, pop, aff, getattr(p, "like_count", 0), p.id, weights, is_seen)
+        scored.append((p, s))
 
     scored.sort(
         key=lambda t: (
@@ -71,3 +87,72 @@ def score_posts_for_user(user, queryset):
         ), 
         reverse=True)
     return scored
+
+
+class ScoredPost:
+    """Compact record for one feed candidate; used instead of a Post instance while scoring."""
+    __slots__ = ("id", "created_at", "like_count", "score")
+
+    def __init__(self, id, created_at, like_count, score):
+        self.id = id
+        self.created_at = created_at
+        self.like_count = like_count
+        self.score = score
+
+def _tag_ids_by_post():
+    #streams (post_id, [tag_id, ...]) ordered by post id, for a merge join with the candidate stream
+    rows = Post.tags.through.objects.order_by("post_id").values_list("post_id", "tag_id")
+    current, tag_ids = None, []
+    for post_id, tag_id in rows.iterator(chunk_size=2000):
+        if post_id != current:
+            if current is not None:
+                yield current, tag_ids
+            current, tag_ids = post_id, []
+        tag_ids.append(tag_id)
+    if current is not None:
+        yield current, tag_ids
+
+def top_posts_for_user(user, k, seen=None, weights=DEFAULT_WEIGHTS):
+    """
+    Lean version of score_posts_for_user for the feed: streams candidates (posts not authored by the user)
+    as plain tuples and keeps only the best `k` in a heap, so memory does not grow with the table.
+    Returns (list of ScoredPost sorted like score_posts_for_user, number of candidates scored).
+    """
+    now = timezone.now()
+    utw = build_user_tag_weights(user, key="id")
+
+    candidates = (
+        Post.objects.exclude(author=user)
+        .order_by("id")
+        .annotate(like_count=like_count_subquery())
+        .values_list("id", "created_at", "like_count")
+    )
+    tags = _tag_ids_by_post()
+    tag_post_id, tag_ids = next(tags, (None, None))
+
+    heap = []
+    count = 0
+    for post_id, created_at, like_count in candidates.iterator(chunk_size=2000):
+        #both streams are ordered by post id, so advance the tag stream up to this post
+        while tag_post_id is not None and tag_post_id < post_id:
+            tag_post_id, tag_ids = next(tags, (None, None))
+        post_tag_ids = tag_ids if tag_post_id == post_id else ()
+
+        is_seen = seen is not None and post_id in seen
+        if is_seen and SEEN_WEIGHT <= 0:
+            continue
+        count += 1
+
+        rec = recency_decay(created_at, now, weights.lam)
+        pop = popularity(like_count)
+        aff = sum(utw.get(t, 0.0) for t in post_tag_ids) / len(post_tag_ids) if post_tag_ids else 0.0
+        s = combine_score(rec, pop, aff, like_count, post_id, weights, is_seen)
+
+        entry = (s, created_at, post_id)
+        if len(heap) < k:
+            heapq.heappush(heap, (entry, like_count))
+        elif entry > heap[0][0]:
+            heapq.heapreplace(heap, (entry, like_count))
+
+    top = sorted(heap, reverse=True)
+    return [ScoredPost(post_id, created_at, like_count, s) for (s, created_at, post_id), like_count in top], count
@@ -0,0 +1,149 @@
+"""
+Offline replay of historical feeds, used by `manage.py tune_weights` to compare scoring weights.
+
+Every sampled Like is treated as an event: we rebuild the feed the user could have seen just before
+that like (posts that existed at that time, with like counts and tag affinity as of that moment) and
+check where the liked post would have ranked. The scorer mirrors recommendation.score_posts_for_user.
+
+Candidate features are computed once into flat numpy arrays, so scoring a weight setting is a few
+vectorized operations over every event at once. Nothing here touches the database after the dataset is
+built, so evaluate_configs can run in a process pool.
+"""
+
+import math
+import random
+from bisect import bisect_right
+from collections import Counter, defaultdict, namedtuple
+
+import numpy as np
+
+ReplayDataset = namedtuple(
+    "ReplayDataset",
+    [
+        "event_of",     # event index of each candidate row
+        "age_hours",    # post age at the time of the event
+        "pop",          # log1p(likes the post had at the time)
+        "aff",          # user tag affinity at the time
+        "tie",          # the scorer's tiebreaker epsilon
+        "target_row",   # row of the liked post, per event
+        "num_events",
+    ],
+)
+
+
+def build_replay_dataset(max_events=1000, negatives=500, seed=0):
+    """
+    Replays every Like in time order and returns a ReplayDataset for up to `max_events` of them.
+    Each event ranks the liked post against up to `negatives` randomly sampled posts that existed then
+    (0 means against all of them).
+    """
+    from .models import Like, Post  # imported here so pool workers can import this module without Django
+
+    rng = random.Random(seed)
+
+    posts = list(Post.objects.order_by("created_at", "id").values_list("id", "author_id", "created_at").iterator())
+    post_times = [created_at.timestamp() for _, _, created_at in posts]
+    index_of = {post_id: i for i, (post_id, _, _) in enumerate(posts)}
+    post_tags = defaultdict(list)
+    for post_id, tag_id in Post.tags.through.objects.values_list("post_id", "tag_id").iterator():
+        post_tags[post_id].append(tag_id)
+
+    likes = list(Like.objects.order_by("created_at", "id").values_list("user_id", "post_id", "created_at").iterator())
+    chosen = set(rng.sample(range(len(likes)), min(max_events, len(likes))))
+
+    like_counts = Counter()
+    user_tags = defaultdict(Counter)
+    user_liked = defaultdict(set)
+
+    columns = {"event_of": [], "age_hours": [], "pop": [], "aff": [], "tie": []}
+    target_rows = []
+
+    for n, (user_id, post_id, liked_at) in enumerate(likes):
+        if n in chosen:
+            now = liked_at.timestamp()
+            available = bisect_right(post_times, now)   # posts that existed when the like happened
+            candidates = [post_id]
+            eligible = lambda other_id, author_id: (
+                other_id != post_id and author_id != user_id and other_id not in user_liked[user_id]
+            )
+            if not negatives or available <= negatives:
+                candidates += [other_id for other_id, author_id, _ in posts[:available] if eligible(other_id, author_id)]
+            else:
+                picked = set()
+                for _ in range(negatives * 3):  # bounded retries when most early posts are not eligible
+                    if len(picked) >= negatives:
+                        break
+                    other_id, author_id, _ = posts[rng.randrange(available)]
+                    if other_id not in picked and eligible(other_id, author_id):
+                        picked.add(other_id)
+                candidates += sorted(picked)
+
+            if len(candidates) > 1:
+                event = len(target_rows)
+                target_rows.append(len(columns["event_of"]))
+                tags = user_tags[user_id]
+                total = sum(tags.values()) or 1
+                for cand_id in candidates:
+                    tag_ids = post_tags.get(cand_id, [])
+                    columns["event_of"].append(event)
+                    columns["age_hours"].append(max(0.0, now - post_times[index_of[cand_id]]) / 3600.0)
+                    columns["pop"].append(math.log1p(like_counts[cand_id]))
+                    columns["aff"].append(sum(tags[t] for t in tag_ids) / total / len(tag_ids) if tag_ids else 0.0)
+                    columns["tie"].append(0.0001 * like_counts[cand_id] + 0.000001 * cand_id)
+
+        # apply the like so later events see it
+        like_counts[post_id] += 1
+        user_tags[user_id].update(post_tags.get(post_id, []))
+        user_liked[user_id].add(post_id)
+
+    return ReplayDataset(
+        event_of=np.asarray(columns["event_of"], dtype=np.int64),
+        age_hours=np.asarray(columns["age_hours"], dtype=np.float64),
+        pop=np.asarray(columns["pop"], dtype=np.float64),
+        aff=np.asarray(columns["aff"], dtype=np.float64),
+        tie=np.asarray(columns["tie"], dtype=np.float64),
+        target_row=np.asarray(target_rows, dtype=np.int64),
+        num_events=len(target_rows),
+    )
+
+
+def target_ranks(dataset, weights):
+    """1-based rank of the liked post within its event, for one (recency, popularity, affinity, lam) setting."""
+    recency, popularity, affinity, lam = weights
+    scores = (
+        recency * np.exp(-lam * dataset.age_hours)
+        + popularity * dataset.pop
+        + affinity * dataset.aff
+        + dataset.tie
+    )
+    target_scores = scores[dataset.target_row]
+    above = scores > target_scores[dataset.event_of]
+    return 1 + np.bincount(dataset.event_of, weights=above, minlength=dataset.num_events).astype(np.int64)
+
+
+def ranking_metrics(ranks, ks):
+    """hit-rate@k, NDCG@k (one relevant item per event) and MRR from an array of ranks."""
+    metrics = {}
+    for k in ks:
+        hit = ranks <= k
+        metrics[f"hit@{k}"] = float(hit.mean()) if len(ranks) else 0.0
+        metrics[f"ndcg@{k}"] = float(np.where(hit, 1.0 / np.log2(ranks + 1), 0.0).mean()) if len(ranks) else 0.0
+    metrics["mrr"] = float((1.0 / ranks).mean()) if len(ranks) else 0.0
+    return metrics
+
+
+_worker_dataset = None
+
+
+def init_worker(dataset):
+    global _worker_dataset
+    _worker_dataset = dataset
+
+
+def evaluate_configs(configs, ks, dataset=None):
+    """
+    Scores a batch of weight settings, given as plain (recency, popularity, affinity, lam) tuples so pool
+    workers never have to import Django. Uses the dataset handed to the pool initializer by default.
+    """
+    dataset = dataset if dataset is not None else _worker_dataset
+    return [(weights, ranking_metrics(target_ranks(dataset, weights), ks)) for weights in configs]
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Impression, Post
+
+#sizing of the per-user seen-set, loaded from the .env like the scoring weights. 8192 bits = 1KB per generation,
+#which keeps false positives around 2% for ~1000 impressions per window
+SEEN_BLOOM_BITS = int(os.getenv("SEEN_BLOOM_BITS", 8192))
+SEEN_BLOOM_HASHES = int(os.getenv("SEEN_BLOOM_HASHES", 4))
+SEEN_DECAY_HOURS = float(os.getenv("SEEN_DECAY_HOURS", 24))
+SEEN_LOCK_SECONDS = 5   #how long a crashed worker can hold a user's seen-set lock
+
+
+class BloomFilter:
+    """
+    Fixed-size probabilistic set of post ids.
+    Never gives false negatives; false positives are bounded by the number of bits and hashes.
+    """
+
+    def __init__(self, num_bits=SEEN_BLOOM_BITS, num_hashes=SEEN_BLOOM_HASHES, data=None):
+        self.bits = bytearray(data) if data is not None else bytearray((num_bits + 7) // 8)
+        self.num_bits = len(self.bits) * 8     #a stored filter keeps its own size even if the env sizing changed
+        self.num_hashes = num_hashes
+
+    def _positions(self, item):
+        #double hashing: derive k bit positions from two 64 bit halves of one digest
+        digest = hashlib.blake2b(str(item).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def to_bytes(self):
+        return bytes(self.bits)
+
+
+class SeenSet:
+    """
+    Per-user seen-set kept in the cache as two Bloom filter generations.
+    New impressions go into the current generation; once it is SEEN_DECAY_HOURS old it becomes
+    the previous one and the oldest is dropped, so posts are "forgotten" after one to two windows.
+    Every write re-reads the stored entry under a per-user lock, so concurrent impression batches and
+    rotations from other workers are merged instead of overwritten.
+    """
+
+    def __init__(self, user_id, started_at, current, previous):
+        self.user_id = user_id
+        self.started_at = started_at
+        self.current = current
+        self.previous = previous
+
+    @staticmethod
+    def cache_key(user_id):
+        return f"posts:seen:{user_id}"
+
+    @classmethod
+    def for_user(cls, user):
+        entry = cache.get(cls.cache_key(user.id))
+        if entry is None:
+            return cls.rebuild(user)
+
+        seen = cls(user.id, *cls._unpack(entry))
+        if seen._expired():
+            seen.rotate()
+        return seen
+
+    @staticmethod
+    def _unpack(entry):
+        started_at, current, previous = entry
+        return started_at, BloomFilter(data=current), BloomFilter(data=previous)
+
+    def _expired(self):
+        return time.time() - self.started_at >= SEEN_DECAY_HOURS * 3600
+
+    @contextmanager
+    def _locked(self):
+        #cache.add only succeeds for one caller, which makes it a lock shared by every worker
+        key = self.cache_key(self.user_id) + ":lock"
+        deadline = time.monotonic() + SEEN_LOCK_SECONDS
+        acquired = cache.add(key, 1, SEEN_LOCK_SECONDS)
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(0.01)
+            acquired = cache.add(key, 1, SEEN_LOCK_SECONDS)
+        try:
+            yield
+        finally:
+            if acquired:
+                cache.delete(key)
+
+    def _reload(self):
+        #pick up what other workers wrote since this copy was read; keep ours if the entry was evicted
+        entry = cache.get(self.cache_key(self.user_id))
+        if entry is not None:
+            self.started_at, self.current, self.previous = self._unpack(entry)
+
+    @classmethod
+    def rebuild(cls, user):
+        """Cache miss: refill the current generation from the user's recent impressions."""
+        since = timezone.now() - timedelta(hours=SEEN_DECAY_HOURS)
+        seen = cls(user.id, time.time(), BloomFilter(), BloomFilter())
+        post_ids = Impression.objects.filter(user=user, created_at__gte=since).values_list("post_id", flat=True)
+        for post_id in post_ids.iterator():
+            seen.current.add(post_id)
+        with seen._locked():
+            #another worker may have filled the entry meanwhile; its copy is at least as recent
+            if cache.get(seen.cache_key(user.id)) is None:
+                seen.save()
+            else:
+                seen._reload()
+        return seen
+
+    def rotate(self):
+        with self._locked():
+            self._reload()
+            if self._expired():     #another worker may have rotated already
+                self.previous = self.current
+                self.current = BloomFilter()
+                self.started_at = time.time()
+                self.save()
+
+    def add_many(self, post_ids):
+        with self._locked():
+            self._reload()
+            for post_id in post_ids:
+                self.current.add(post_id)
+            self.save()
+
+    def save(self):
+        """Writes this copy as is; callers hold the lock and have reloaded first."""
+        timeout = int(SEEN_DECAY_HOURS * 3600 * 2)
+        entry = (self.started_at, self.current.to_bytes(), self.previous.to_bytes())
+        cache.set(self.cache_key(self.user_id), entry, timeout)
+
+    def __contains__(self, post_id):
+        return post_id in self.current or post_id in self.previous
+
+
+def record_impressions(user, post_ids):
+    """
+    Persists a batch of impressions and marks the posts as seen.
+    Unknown post ids are ignored. Returns the number of impressions recorded.
+    """
+    post_ids = list(Post.objects.filter(id__in=set(post_ids)).values_list("id", flat=True))
+    Impression.objects.bulk_create([Impression(user=user, post_id=pid) for pid in post_ids])
+    SeenSet.for_user(user).add_many(post_ids)
+    return len(post_ids)
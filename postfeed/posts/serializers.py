@@ -4,8 +4,34 @@ from .models import Post, Tag, Like
 
 User = get_user_model()
 
+
+def requested_fields(request, serializer_class):
+    """
+    Parses the sparse-fieldset parameter (?fields=id,like_count) of a GET request.
+    Returns the set of requested field names, or None when all fields should be returned.
+    """
+    if request is None or request.method != "GET" or not request.query_params.get("fields"):
+        return None
+    fields = {f.strip() for f in request.query_params["fields"].split(",") if f.strip()}
+    readable = {name for name, field in serializer_class().fields.items() if not field.write_only}
+    unknown = fields - readable
+    if unknown:
+        raise serializers.ValidationError({"fields": f"Unknown field(s): {', '.join(sorted(unknown))}"})
+    return fields
+
+
+class SparseFieldsMixin:
+    """Drops every field the request did not ask for with ?fields=."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get("request"), type(self))
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
 #
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:     #tells DRF which model the serializer is tied to and what to serialize.
         model = User
         fields = ["id", "username", "email", "password", "date_joined"]
@@ -23,9 +49,10 @@ class UserSerializer(serializers.ModelSerializer):
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
-        fields = ["id", "name"]
+        fields = ["id", "name", "post_count"]
+        read_only_fields = ["id", "post_count"]
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())    #serializes the author's id and the User.objects.all tells DRF to look into the User objects for it.
     tags = serializers.SlugRelatedField(
         many=True, slug_field="name", queryset=Tag.objects.all(), required=False
@@ -42,11 +69,17 @@ class PostSerializer(serializers.ModelSerializer):
 class PostCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
-        fields = ["content"]
+        fields = ["id", "text"]
+        read_only_fields = ["id"]
 
 
 
 class LikeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Like
-        fields = ["id", "user", "post", "created_at"]
\ No newline at end of file
+        fields = ["id", "user", "post", "created_at"]
+
+class ImpressionBatchSerializer(serializers.Serializer):     #a batch of post ids the client has shown to the user
+    post_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500
+    )
@@ -0,0 +1,68 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Post, Tag
+from .tag_index import tag_index
+
+
+def _adjust_post_count(tag_ids, delta):
+    #bump the stored counter in the database and the in-memory autocomplete index together
+    tag_ids = list(tag_ids)
+    if not tag_ids or not delta:
+        return
+    Tag.objects.filter(id__in=tag_ids).update(post_count=Greatest(F("post_count") + delta, 0))
+    tag_index.adjust(tag_ids, delta)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        #pk_set is not given on clear, so remember what is about to be removed
+        if reverse:
+            instance._cleared_post_count = instance.posts.count()
+        else:
+            instance._cleared_tag_ids = list(instance.tags.values_list("id", flat=True))
+    elif action == "post_clear":
+        if reverse:
+            _adjust_post_count([instance.id], -instance.__dict__.pop("_cleared_post_count", 0))
+        else:
+            _adjust_post_count(instance.__dict__.pop("_cleared_tag_ids", []), -1)
+    elif action == "pre_remove":
+        #pk_set holds every id passed to remove(), linked or not, so keep only the links that exist
+        if reverse:
+            instance._removed_post_count = instance.posts.filter(id__in=pk_set).count()
+        else:
+            instance._removed_tag_ids = list(instance.tags.filter(id__in=pk_set).values_list("id", flat=True))
+    elif action == "post_remove":
+        if reverse:
+            _adjust_post_count([instance.id], -instance.__dict__.pop("_removed_post_count", 0))
+        else:
+            _adjust_post_count(instance.__dict__.pop("_removed_tag_ids", []), -1)
+    elif action == "post_add":
+        #add() already drops ids that were linked, so pk_set is exactly the new links
+        if reverse:
+            #tag.posts.add(...): one tag gained len(pk_set) posts
+            if pk_set:
+                _adjust_post_count([instance.id], len(pk_set))
+        else:
+            _adjust_post_count(pk_set, 1)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    #the tag links are removed by cascade without an m2m_changed signal
+    _adjust_post_count(instance.tags.values_list("id", flat=True), -1)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, update_fields=None, **kwargs):
+    #the instance's post_count may be stale (Tag.save only writes it on insert), so index the stored one
+    instance.post_count = Tag.objects.filter(id=instance.id).values_list("post_count", flat=True).first() or 0
+    tag_index.upsert(instance)
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    tag_index.remove(instance.id)
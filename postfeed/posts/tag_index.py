@@ -0,0 +1,81 @@
+import heapq
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+
+from .models import Tag
+
+#how long a worker trusts its in-memory index before reloading it, so tags created in other workers show up
+TAG_INDEX_TTL = float(os.getenv("TAG_INDEX_TTL", 300))
+
+
+class TagIndex:
+    """
+    In-memory sorted index of tag names for prefix search.
+    Keys are (lowercased name, id) kept sorted, so all tags starting with a prefix sit in one
+    contiguous slice found with bisect. Matches are ranked by post_count (then name).
+    Signals in posts/signals.py keep it in sync within the worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []         # sorted [(name_lower, id)]
+        self._entries = {}      # id -> [name, post_count]
+        self._loaded_at = None
+
+    def load(self):
+        rows = Tag.objects.values_list("id", "name", "post_count")
+        entries = {tag_id: [name, count] for tag_id, name, count in rows.iterator()}
+        keys = sorted((name.lower(), tag_id) for tag_id, (name, _) in entries.items())
+        with self._lock:
+            self._keys, self._entries = keys, entries
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > TAG_INDEX_TTL:
+            self.load()
+
+    def search(self, prefix, limit):
+        """Returns up to `limit` (id, name, post_count) tuples whose name starts with `prefix`."""
+        self._ensure_loaded()
+        prefix = prefix.lower()
+        with self._lock:
+            lo = bisect_left(self._keys, (prefix,))
+            hi = bisect_left(self._keys, (prefix + "\uffff",))
+            entries = self._entries
+            top = heapq.nsmallest(limit, self._keys[lo:hi], key=lambda k: (-entries[k[1]][1], k[0]))
+            return [(tag_id, entries[tag_id][0], entries[tag_id][1]) for _, tag_id in top]
+
+    def upsert(self, tag):
+        if self._loaded_at is None:
+            return  # nothing loaded yet, the next search reads fresh rows
+        with self._lock:
+            old = self._entries.get(tag.id)
+            if old is not None:
+                self._keys.remove((old[0].lower(), tag.id))
+            self._entries[tag.id] = [tag.name, tag.post_count]
+            insort(self._keys, (tag.name.lower(), tag.id))
+
+    def remove(self, tag_id):
+        if self._loaded_at is None:
+            return
+        with self._lock:
+            old = self._entries.pop(tag_id, None)
+            if old is not None:
+                self._keys.remove((old[0].lower(), tag_id))
+
+    def adjust(self, tag_ids, delta):
+        if self._loaded_at is None:
+            return
+        with self._lock:
+            for tag_id in tag_ids:
+                entry = self._entries.get(tag_id)
+                if entry is not None:
+                    entry[1] = max(0, entry[1] + delta)
+
+
+tag_index = TagIndex()
@@ -1,12 +1,34 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from datetime import timedelta
+from io import StringIO
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from unittest import mock, skipUnless
+from django.core.management import call_command
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count
 from rest_framework.test import APIClient
 from rest_framework import status
 
-from posts.models import Post, Tag, Like
-from posts.recommendation import score_posts_for_user
+from posts.models import Post, Tag, Like, Impression
+from posts.recommendation import score_posts_for_user, top_posts_for_user, Weights
+from posts.seen import BloomFilter, SeenSet
+from posts.tag_index import tag_index
+from posts.warmup import warm_up
+from postfeed import schema
+
+try:
+    import numpy
+    from posts.replay import build_replay_dataset, evaluate_configs
+except ImportError:  # the replay tool is optional tooling
+    numpy = None
 
 User = get_user_model()
 
@@ -122,3 +144,358 @@ class FeedEndpointTests(TestCase):
         self.assertIn("results", response.data)
         self.assertGreaterEqual(len(response.data["results"]), 1)
         self.assertIn("score", response.data["results"][0])
+
+    def test_feed_rejects_offset_past_limit(self):
+        """Deep offsets are refused rather than silently clamped to a page the client did not ask for."""
+        self.assertEqual(self.client.get("/api/feed/", {"offset": 1000}).status_code, status.HTTP_200_OK)
+        response = self.client.get("/api/feed/", {"offset": 1001})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("1000", str(response.data["offset"]))
+        self.assertEqual(self.client.get("/api/feed/", {"offset": "abc"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BloomFilterTests(TestCase):
+    def test_added_ids_are_always_found(self):
+        """A Bloom filter never forgets an id it was given."""
+        bloom = BloomFilter()
+        for post_id in range(1, 500):
+            bloom.add(post_id)
+        self.assertTrue(all(post_id in bloom for post_id in range(1, 500)))
+
+    def test_false_positive_rate_is_bounded(self):
+        """Unseen ids should only rarely be reported as seen."""
+        bloom = BloomFilter(num_bits=8192, num_hashes=4)
+        for post_id in range(1, 1000):
+            bloom.add(post_id)
+        false_positives = sum(1 for post_id in range(100000, 110000) if post_id in bloom)
+        self.assertLess(false_positives / 10000, 0.05)
+
+    def test_round_trips_through_bytes(self):
+        bloom = BloomFilter()
+        bloom.add(42)
+        self.assertIn(42, BloomFilter(data=bloom.to_bytes()))
+
+
+class ImpressionEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="joy", password="mypassword")
+        self.other_user = User.objects.create_user(username="john", password="pass123")
+        self.seen_post = Post.objects.create(author=self.other_user, text="Already seen")
+        self.fresh_post = Post.objects.create(author=self.other_user, text="Not seen yet")
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_impressions_require_authentication(self):
+        response = APIClient().post("/api/impressions/", {"post_ids": [self.seen_post.id]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_batch_is_recorded_and_unknown_ids_ignored(self):
+        response = self.client.post(
+            "/api/impressions/", {"post_ids": [self.seen_post.id, 999999]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["recorded"], 1)
+        self.assertEqual(Impression.objects.filter(user=self.user).count(), 1)
+
+    def test_feed_drops_seen_posts(self):
+        """Posts reported as impressions should not come back on the next refresh."""
+        self.client.post("/api/impressions/", {"post_ids": [self.seen_post.id]}, format="json")
+        response = self.client.get("/api/feed/")
+        ids = [row["id"] for row in response.data["results"]]
+        self.assertNotIn(self.seen_post.id, ids)
+        self.assertIn(self.fresh_post.id, ids)
+
+    def test_impressions_are_visible_to_other_workers(self):
+        """Each worker builds its own cache client; an impression recorded through one must be seen through another."""
+        worker_a = caches.create_connection("default")
+        worker_b = caches.create_connection("default")
+        self.assertIsNot(worker_a, worker_b)
+        # LocMemCache instances share storage inside one process but not across gunicorn workers
+        self.assertNotIsInstance(worker_a, LocMemCache)
+
+        with mock.patch("posts.seen.cache", worker_b):
+            self.assertNotIn(self.seen_post.id, SeenSet.for_user(self.user))  # b caches its filter first
+        with mock.patch("posts.seen.cache", worker_a):
+            self.client.post("/api/impressions/", {"post_ids": [self.seen_post.id]}, format="json")
+        with mock.patch("posts.seen.cache", worker_b):
+            self.assertIn(self.seen_post.id, SeenSet.for_user(self.user))
+
+    def test_concurrent_batches_do_not_overwrite_each_other(self):
+        """Two workers holding copies read before either write must both end up in the stored seen-set."""
+        first, second = SeenSet.for_user(self.user), SeenSet.for_user(self.user)
+        first.add_many([self.seen_post.id])
+        second.add_many([self.fresh_post.id])
+        seen = SeenSet.for_user(self.user)
+        self.assertIn(self.seen_post.id, seen)
+        self.assertIn(self.fresh_post.id, seen)
+
+    def test_rotation_keeps_batches_recorded_meanwhile(self):
+        stale = SeenSet.for_user(self.user)
+        SeenSet.for_user(self.user).add_many([self.seen_post.id])
+        with mock.patch("posts.seen.SeenSet._expired", return_value=True):  # the rotation window has passed
+            stale.rotate()
+        seen = SeenSet.for_user(self.user)
+        self.assertIn(self.seen_post.id, seen.previous)
+        self.assertNotIn(self.seen_post.id, seen.current)
+
+    def test_seen_set_is_rebuilt_from_impressions(self):
+        """A cold cache should be refilled from the stored impressions."""
+        Impression.objects.create(user=self.user, post=self.seen_post)
+        cache.clear()
+        seen = SeenSet.for_user(self.user)
+        self.assertIn(self.seen_post.id, seen)
+        self.assertNotIn(self.fresh_post.id, seen)
+
+
+class TagPopularityTests(TestCase):
+    def setUp(self):
+        tag_index.invalidate()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="joy", password="mypassword")
+        self.client.force_authenticate(user=self.user)
+
+        self.django_tag = Tag.objects.create(name="django")
+        self.djangocon_tag = Tag.objects.create(name="djangocon")
+        self.python_tag = Tag.objects.create(name="python")
+
+        for i in range(3):
+            post = Post.objects.create(author=self.user, text=f"post {i}")
+            post.tags.add(self.djangocon_tag)
+        self.post = Post.objects.create(author=self.user, text="django post")
+        self.post.tags.add(self.django_tag, self.python_tag)
+
+    def tearDown(self):
+        tag_index.invalidate()
+
+    def count(self, tag):
+        tag.refresh_from_db()
+        return tag.post_count
+
+    def test_post_count_follows_tag_changes(self):
+        self.assertEqual(self.count(self.djangocon_tag), 3)
+        self.post.tags.remove(self.python_tag)
+        self.assertEqual(self.count(self.python_tag), 0)
+        self.post.tags.clear()
+        self.assertEqual(self.count(self.django_tag), 0)
+
+    def test_removing_unlinked_tag_keeps_count(self):
+        """remove() with a tag or post that was never linked must not decrement anything."""
+        self.post.tags.remove(self.djangocon_tag)
+        self.assertEqual(self.count(self.djangocon_tag), 3)
+        self.python_tag.posts.remove(self.post, Post.objects.filter(tags=self.djangocon_tag).first())
+        self.assertEqual(self.count(self.python_tag), 0)
+        self.assertEqual(self.count(self.djangocon_tag), 3)
+        response = self.client.get("/api/tags/autocomplete/", {"q": "djangocon"})
+        self.assertEqual(response.data["results"][0]["post_count"], 3)
+
+    def test_saving_stale_tag_keeps_count(self):
+        """Renaming a Tag loaded before its posts changed must not write back its old count."""
+        self.client.get("/api/tags/autocomplete/", {"q": "dj"})  # loads the index
+        stale = Tag.objects.get(id=self.djangocon_tag.id)
+        Post.objects.create(author=self.user, text="one more").tags.add(self.djangocon_tag)
+        stale.name = "djangocon-eu"
+        stale.save()
+        self.assertEqual(self.count(self.djangocon_tag), 4)
+        self.assertEqual(self.djangocon_tag.name, "djangocon-eu")
+        response = self.client.get("/api/tags/autocomplete/", {"q": "djangocon"})
+        self.assertEqual(response.data["results"][0]["post_count"], 4)
+
+    def test_post_count_drops_when_post_deleted(self):
+        self.post.delete()
+        self.assertEqual(self.count(self.django_tag), 0)
+        self.assertEqual(self.count(self.python_tag), 0)
+
+    def test_autocomplete_ranks_by_usage(self):
+        """Tags matching the prefix come back most used first."""
+        response = self.client.get("/api/tags/autocomplete/", {"q": "DJ"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        names = [row["name"] for row in response.data["results"]]
+        self.assertEqual(names, ["djangocon", "django"])
+        self.assertEqual(response.data["results"][0]["post_count"], 3)
+        self.assertIn("max-age=60", response["Cache-Control"])
+
+    def test_autocomplete_sees_new_tags_and_counts(self):
+        self.client.get("/api/tags/autocomplete/", {"q": "py"})  # loads the index
+        pytest_tag = Tag.objects.create(name="pytest")
+        for i in range(2):
+            Post.objects.create(author=self.user, text=f"test {i}").tags.add(pytest_tag)
+        response = self.client.get("/api/tags/autocomplete/", {"q": "py", "limit": 1})
+        self.assertEqual([row["name"] for row in response.data["results"]], ["pytest"])
+
+    def test_autocomplete_rejects_non_numeric_limit(self):
+        response = self.client.get("/api/tags/autocomplete/", {"q": "dj", "limit": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("limit", response.data)
+
+
+class ListPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="joy", password="mypassword")
+        self.client.force_authenticate(user=self.user)
+        self.tag = Tag.objects.create(name="django")
+        self.posts = [Post.objects.create(author=self.user, text=f"post {i}") for i in range(25)]
+        for post in self.posts[:5]:
+            post.tags.add(self.tag)
+        Like.objects.create(user=self.user, post=self.posts[-1])
+
+    def test_posts_are_cursor_paginated(self):
+        """Walking the cursor returns every post exactly once, newest first."""
+        response = self.client.get("/api/posts/", {"limit": 10})
+        self.assertEqual(len(response.data["results"]), 10)
+        seen = [row["id"] for row in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen += [row["id"] for row in response.data["results"]]
+        self.assertEqual(seen, [p.id for p in reversed(self.posts)])
+
+    def test_sparse_fields_narrow_the_response(self):
+        response = self.client.get("/api/posts/", {"fields": "id,like_count"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first = response.data["results"][0]
+        self.assertEqual(set(first), {"id", "like_count"})
+        self.assertEqual(first, {"id": self.posts[-1].id, "like_count": 1})
+
+    def test_sparse_fields_list_is_a_single_query(self):
+        """Without tags requested there is no prefetch, so the page costs one query."""
+        with self.assertNumQueries(1):
+            self.client.get("/api/posts/", {"fields": "id,like_count"})
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get("/api/posts/", {"fields": "id,nope"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_users_are_paginated_by_id(self):
+        for i in range(3):
+            User.objects.create_user(username=f"user{i}", password="pass123")
+        response = APIClient().get("/api/users/", {"limit": 2, "fields": "id,username"})
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertEqual(set(response.data["results"][0]), {"id", "username"})
+        self.assertIsNotNone(response.data["next"])
+
+
+@skipUnless(numpy, "numpy is needed for the replay tool")
+class SeedCommandTests(TestCase):
+    def test_seeds_load_test_sizes(self):
+        """The load test seeds 1000+ posts; tags must come from the --tags pool, not one new word per post."""
+        call_command("seed", users=20, tags=15, posts=1000, likes=300, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 1000)
+        self.assertEqual(Tag.objects.count(), 15)
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Like.objects.count(), 300)
+        links = Post.tags.through.objects.count()
+        self.assertEqual(sum(Tag.objects.values_list("post_count", flat=True)), links)
+        self.assertFalse(Post.objects.annotate(n=Count("tags")).filter(n=0).exists())
+
+
+class ReplayTuningTests(TestCase):
+    def setUp(self):
+        # one author posts alternating django / python posts; the reader only ever likes django ones
+        self.author = User.objects.create_user(username="john", password="pass123")
+        self.reader = User.objects.create_user(username="joy", password="mypassword")
+        django_tag = Tag.objects.create(name="django")
+        python_tag = Tag.objects.create(name="python")
+        posts = []
+        for i in range(20):
+            post = Post.objects.create(author=self.author, text=f"post {i}")
+            post.tags.add(django_tag if i % 2 == 0 else python_tag)
+            posts.append(post)
+        for post in posts[::2]:
+            Like.objects.create(user=self.reader, post=post)
+
+    def test_affinity_weight_is_rewarded_on_replay(self):
+        """Settings that use tag affinity should rank the liked django posts higher than ones that ignore it."""
+        dataset = build_replay_dataset(max_events=100, negatives=0)
+        self.assertEqual(dataset.num_events, 10)
+        (_, with_aff), (_, without_aff) = evaluate_configs(
+            [Weights(0.0, 0.0, 1.0, 0.05), Weights(0.0, 0.0, 0.0, 0.05)], [1], dataset
+        )
+        self.assertGreater(with_aff["mrr"], without_aff["mrr"])
+
+    def test_command_reports_current_weights(self):
+        out = StringIO()
+        call_command("tune_weights", "--workers=1", "--recency=1,3", "--popularity=0.8", "--affinity=1.2", "--lambdas=0.05", stdout=out)
+        self.assertIn("<- current", out.getvalue())
+        self.assertIn("WEIGHT_RECENCY=", out.getvalue())
+
+
+class LeanFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="joy", password="mypassword")
+        authors = User.objects.bulk_create([User(username=f"author{i}") for i in range(20)])
+        tags = Tag.objects.bulk_create([Tag(name=f"tag{i}") for i in range(30)])
+        Post.objects.bulk_create([Post(author=authors[i % 20], text="x" * 200) for i in range(5000)])
+        post_ids = list(Post.objects.values_list("id", flat=True))
+        Post.tags.through.objects.bulk_create([
+            Post.tags.through(post_id=post_id, tag_id=tags[(post_id * 7 + j) % 30].id)
+            for post_id in post_ids for j in range(2)
+        ])
+        Like.objects.bulk_create(
+            [Like(user=authors[i % 20], post_id=post_ids[(i * 13) % len(post_ids)]) for i in range(5000)],
+            ignore_conflicts=True,
+        )
+        Like.objects.create(user=self.user, post_id=post_ids[0])
+
+    def test_matches_full_scoring(self):
+        """The streaming top-k must pick the same posts, in the same order, as scoring everything."""
+        qs = Post.objects.exclude(author=self.user).annotate(like_count=Count("likes")).prefetch_related("tags")
+        expected = [p.id for p, _ in score_posts_for_user(self.user, qs)[:25]]
+        top, count = top_posts_for_user(self.user, 25)
+        self.assertEqual([r.id for r in top], expected)
+        self.assertEqual(count, 5000)
+
+    def test_memory_ceiling(self):
+        """Peak memory for scoring 5000 candidates stays small because no Post instances are built."""
+        tracemalloc.start()
+        top_posts_for_user(self.user, 100)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertLess(peak, 2 * 1024 * 1024)
+
+
+class StartupTests(TestCase):
+    def test_serving_import_graph_stays_lean(self):
+        """Loading the app and its urls in static-schema mode must not pull in dev-only or schema-generation modules."""
+        code = (
+            "import sys, django; django.setup();"
+            "from django.urls import get_resolver; get_resolver().url_patterns;"
+            "from postfeed.wsgi import application;"
+            "heavy = ['factory', 'faker', 'numpy', 'drf_spectacular.openapi', 'drf_spectacular.views'];"
+            "print(','.join(m for m in heavy if m in sys.modules))"
+        )
+        with tempfile.NamedTemporaryFile(suffix=".json") as schema_file:
+            schema_file.write(b'{"openapi": "3.0.3"}')
+            schema_file.flush()
+            env = dict(
+                os.environ, DJANGO_SETTINGS_MODULE="postfeed.settings", SERVE_STATIC_SCHEMA="True",
+                STARTUP_WARMUP="False", OPENAPI_SCHEMA_FILE=schema_file.name,
+            )
+            result = subprocess.run(
+                [sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True,
+                cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+            )
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_prebuilt_schema_is_served_with_etag(self):
+        with tempfile.NamedTemporaryFile(suffix=".json") as f:
+            f.write(b'{"openapi": "3.0.3"}')
+            f.flush()
+            schema._static_schema = None
+            with override_settings(SERVE_STATIC_SCHEMA=True, OPENAPI_SCHEMA_FILE=f.name):
+                response = self.client.get("/api/schema/")
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.content, b'{"openapi": "3.0.3"}')
+                again = self.client.get("/api/schema/", HTTP_IF_NONE_MATCH=response["ETag"])
+                self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+            schema._static_schema = None
+
+    def test_worker_refuses_to_start_without_prebuilt_schema(self):
+        schema._static_schema = None
+        with override_settings(SERVE_STATIC_SCHEMA=True, OPENAPI_SCHEMA_FILE="/nonexistent/openapi-schema.json"):
+            for warmup in (True, False):
+                with override_settings(STARTUP_WARMUP=warmup), self.assertRaises(ImproperlyConfigured):
+                    warm_up()
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet, TagViewSet, PostViewSet, FeedView
+from .views import UserViewSet, TagViewSet, PostViewSet, FeedView, ImpressionView
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
@@ -10,4 +10,5 @@ router.register(r'posts', PostViewSet, basename='post')
 urlpatterns = [
     path("", include(router.urls)),
     path("feed/", FeedView.as_view(), name="feed"),
+    path("impressions/", ImpressionView.as_view(), name="impressions"),
 ]
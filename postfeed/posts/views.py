@@ -1,41 +1,92 @@
-from django.shortcuts import render
 from django.contrib.auth import get_user_model
-from django.db.models import Count
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 
-from .models import Post, Tag, Like
-from .serializers import UserSerializer, PostSerializer, PostCreateSerializer, TagSerializer, LikeSerializer
-from .recommendation import score_posts_for_user
+from .models import Post, Tag, Like, like_count_subquery
+from .pagination import PostCursorPagination, UserCursorPagination
+from .serializers import requested_fields, UserSerializer, PostSerializer, PostCreateSerializer, TagSerializer, LikeSerializer, ImpressionBatchSerializer
+from .recommendation import top_posts_for_user
+from .seen import SeenSet, record_impressions
+from .tag_index import tag_index
 
 User = get_user_model()
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all().order_by("id")
     serializer_class = UserSerializer
+    pagination_class = UserCursorPagination
     http_method_names = ["get", "post", "retrieve", "head", "options"]
     permission_classes = [AllowAny] 
 
+    def get_queryset(self):
+        fields = requested_fields(self.request, UserSerializer)
+        if fields is None:
+            return self.queryset
+        return self.queryset.only("id", *fields)
+
 class TagViewSet(viewsets.ModelViewSet):
     queryset = Tag.objects.all().order_by("name")
     serializer_class = TagSerializer
     http_method_names = ["get", "post", "head", "options"]
     permission_classes = [IsAuthenticated]  # only authenticated users can create/view tags
 
+    @action(detail=False, methods=["get"])
+    @method_decorator(cache_control(private=True, max_age=60))
+    def autocomplete(self, request):
+        """
+        Prefix search over tag names, most used tags first. Served from the in-memory tag index.
+        """
+        prefix = request.query_params.get("q", "").strip()
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            return Response({"limit": "Must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, 50))
+
+        if not prefix:
+            return Response({"results": []})
+
+        results = [
+            {"id": tag_id, "name": name, "post_count": count}
+            for tag_id, name, count in tag_index.search(prefix, limit)
+        ]
+        return Response({"results": results})
+
 class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.all().order_by("-created_at").annotate(like_count=Count("likes"))
+    queryset = Post.objects.all().order_by("-created_at", "-id")
     serializer_class = PostSerializer
+    pagination_class = PostCursorPagination
     http_method_names = ["get", "post", "put", "patch", "delete", "head", "options"]
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        """
+        Narrows the SELECT to what ?fields= asks for: like counts and tags are only fetched when requested.
+        """
+        fields = requested_fields(self.request, PostSerializer)
+        qs = self.queryset
+        if fields is None or "like_count" in fields:
+            qs = qs.annotate(like_count=like_count_subquery())
+        if fields is None or "tags" in fields:
+            qs = qs.prefetch_related("tags")
+        if fields is not None:
+            columns = fields & {"author", "text", "created_at"}
+            qs = qs.only("id", "created_at", *columns)     # created_at is needed for the cursor
+        return qs
+
     def get_serializer_class(self):
         if self.action in ["create", "update", "partial_update"]:
             return PostCreateSerializer
         return PostSerializer
 
+    def perform_create(self, serializer):
+        serializer.save(author=self.request.user)
+
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
     def like(self, request, pk=None):
         """
@@ -66,26 +117,49 @@ class FeedView(APIView):
     def get(self, request):
         user = request.user
 
-        limit = int(request.query_params.get("limit", 20))
-        offset = int(request.query_params.get("offset", 0))
+        try:
+            limit = int(request.query_params.get("limit", 20))
+            offset = int(request.query_params.get("offset", 0))
+        except ValueError:
+            return Response({"detail": "limit and offset must be integers."}, status=status.HTTP_400_BAD_REQUEST)
         limit = max(1, min(limit, 100))
-
-        # Candidate set: all posts not authored by the user
-        base_qs = (
-            Post.objects.exclude(author=user)
-            .annotate(like_count=Count("likes"))
-            .prefetch_related("tags", "author")
-        )
-
-        scored = score_posts_for_user(user, base_qs)
-        page = scored[offset : offset + limit]
+        offset = max(0, offset)
+        if offset > 1000:  # only offset + limit candidates are kept while scoring
+            return Response({"offset": "Must be at most 1000."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Candidates (all posts not authored by the user) are streamed as plain rows and only the top
+        # offset + limit are kept. Posts the user has already been shown are dropped (or down-weighted)
+        top, count = top_posts_for_user(user, offset + limit, seen=SeenSet.for_user(user))
+        page = top[offset:]
+
+        # only the returned page is loaded as Post instances
+        posts = Post.objects.filter(id__in=[r.id for r in page]).prefetch_related("tags").in_bulk()
+        ordered = []
+        for record in page:
+            post = posts.get(record.id)
+            if post is not None:
+                post.like_count = record.like_count
+                ordered.append(post)
 
         # attach score to serializer output
-        posts = [p for (p, _) in page]
-        scores_map = {p.id: s for (p, s) in page}
-        serializer = PostSerializer(posts, many=True)
+        scores_map = {r.id: r.score for r in page}
+        serializer = PostSerializer(ordered, many=True)
         data = serializer.data
         for row in data:
             row["score"] = round(scores_map.get(row["id"], 0.0), 6)
 
-        return Response({"count": len(scored), "results": data})
\ No newline at end of file
+        return Response({"count": count, "results": data})
+
+
+class ImpressionView(APIView):
+    """
+    Record a batch of feed impressions for the authenticated user.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = ImpressionBatchSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recorded = record_impressions(request.user, serializer.validated_data["post_ids"])
+        return Response({"recorded": recorded}, status=status.HTTP_201_CREATED)
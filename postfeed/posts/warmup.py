@@ -0,0 +1,50 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    """
+    Pays the first-request costs up front: imports the URLconf, views and auth backend, opens the
+    database connection, and loads the tag index and the prebuilt OpenAPI schema.
+    Called from wsgi.py / asgi.py, so it runs in each worker before the server hands it requests.
+    Warm-up failures are logged, never raised, so a slow dependency cannot stop a worker from booting.
+    A missing schema file is a broken build rather than a slow dependency, so it does stop the worker,
+    whether or not STARTUP_WARMUP is on.
+    """
+    if settings.SERVE_STATIC_SCHEMA:
+        from postfeed.schema import load_static_schema
+
+        if load_static_schema() is None:
+            raise ImproperlyConfigured(
+                f"SERVE_STATIC_SCHEMA is on but {settings.OPENAPI_SCHEMA_FILE} does not exist, build it with "
+                "`manage.py spectacular --format openapi-json --file openapi-schema.json`"
+            )
+
+    if not settings.STARTUP_WARMUP:
+        return
+
+    started = time.perf_counter()
+    try:
+        from django.db import connection
+        from django.urls import get_resolver
+        from rest_framework.settings import api_settings
+
+        from .tag_index import tag_index
+
+        get_resolver().url_patterns              # imports every view module
+        api_settings.DEFAULT_AUTHENTICATION_CLASSES   # imports the JWT authentication backend
+        connection.ensure_connection()
+        tag_index.load()
+    except Exception:
+        logger.exception("Startup warm-up failed, continuing cold")
+        return
+    finally:
+        # the check above proves the database is reachable; don't carry an import-time connection into requests
+        from django.db import connections
+        connections.close_all()
+    logger.info("Startup warm-up finished in %.0fms", (time.perf_counter() - started) * 1000)